@@ -12,7 +12,6 @@ import idaapi
 import ida_kernwin
 
 from capa.ida.helpers import is_supported_file_type, is_supported_ida_version
-from capa.ida.plugin.form import CapaExplorerForm
 from capa.ida.plugin.icon import ICON
 
 logger = logging.getLogger(__name__)
@@ -54,6 +53,9 @@ class CapaExplorerPlugin(idaapi.plugin_t):
 
     def run(self, arg):
         """called when IDA is running the plugin as a script"""
+        # import form, and with it capa rules, extractors, etc., on first use rather than when IDA loads the plugin
+        from capa.ida.plugin.form import CapaExplorerForm
+
         self.form = CapaExplorerForm(self.PLUGIN_NAME)
         return True
 
@@ -7,14 +7,13 @@
 # See the License for the specific language governing permissions and limitations under the License.
 
 import os
-import json
 import logging
-import collections
 
+import six
 import idaapi
 import ida_kernwin
 import ida_settings
-from PyQt5 import QtGui, QtCore, QtWidgets
+from PyQt5 import QtCore, QtWidgets
 
 import capa.main
 import capa.rules
@@ -22,14 +21,35 @@ import capa.ida.helpers
 import capa.render.utils as rutils
 import capa.features.extractors.ida
 from capa.ida.plugin.icon import QICON
-from capa.ida.plugin.view import CapaExplorerQtreeView
+from capa.ida.plugin.view import CapaExplorerQtreeView, updates_disabled
 from capa.ida.plugin.hooks import CapaExplorerIdaHooks
-from capa.ida.plugin.model import CapaExplorerDataModel
+from capa.ida.plugin.model import CapaExplorerDataModel, CapaExplorerAttackModel
 from capa.ida.plugin.proxy import CapaExplorerRangeProxyModel, CapaExplorerSearchProxyModel
 
 logger = logging.getLogger(__name__)
 settings = ida_settings.IDASettings("capa")
 
+# initial width of MITRE ATT&CK tactic column
+ATTACK_TACTIC_SECTION_SIZE = 250
+# delay, in milliseconds, before resetting tree view after user navigates to a new function
+VIEW_TREE_RESET_DELAY = 100
+
+# shared JSON encoder used to export results when orjson is not installed; emit non-ASCII characters as-is
+# rather than escaping them, matching orjson output
+JSON_ENCODER = capa.render.CapaJsonObjectEncoder(sort_keys=True, ensure_ascii=False)
+# size, in bytes, of the file buffer used when exporting results
+EXPORT_BUFFER_SIZE = 1 << 20
+
+
+def orjson_default(obj):
+    """serialize objects orjson does not support natively, emit Python sets as sorted lists
+
+    mirrors set handling of capa.render.CapaJsonObjectEncoder
+    """
+    if isinstance(obj, set):
+        return list(sorted(obj))
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
 
 class UserCancelledError(Exception):
     """throw exception when user cancels action"""
@@ -65,12 +85,104 @@ class CapaExplorerFeatureExtractor(capa.features.extractors.ida.IdaFeatureExtrac
     def __init__(self):
         super(CapaExplorerFeatureExtractor, self).__init__()
         self.indicator = CapaExplorerProgressIndicator()
+        self.functions = None
+
+    def get_functions(self):
+        """enumerate functions once, reuse for later calls
+
+        functions are enumerated to calculate analysis progress and again when finding capabilities
+        """
+        if self.functions is None:
+            self.functions = list(super(CapaExplorerFeatureExtractor, self).get_functions())
+        return iter(self.functions)
 
     def extract_function_features(self, f):
         self.indicator.update("function at 0x%X" % f.start_ea)
         return super(CapaExplorerFeatureExtractor, self).extract_function_features(f)
 
 
+class CapaExplorerRulesLoader(QtCore.QObject):
+    """load capa rules on a background thread
+
+    rule loading does not use the IDA API so is safe to run off the main thread, keeping IDA responsive;
+    feature extraction uses the IDA API so must remain on the main thread
+    """
+
+    progress = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, rule_path):
+        """initialize loader
+
+        @param rule_path: file or directory containing capa rules
+        """
+        super(CapaExplorerRulesLoader, self).__init__()
+        self.rule_path = rule_path
+        self.rules = None
+        self.rule_count = 0
+        self.error = None
+        self.cancelled = False
+
+    def run(self):
+        """load rules, store results or error for the main thread, and emit finished"""
+        try:
+            self.rules, self.rule_count = self.load_rules()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished.emit()
+
+    def load_rules(self):
+        """load rules from rule path
+
+        @retval tuple of (capa.rules.RuleSet, rule count)
+        """
+        rule_path = self.rule_path
+
+        if not os.path.exists(rule_path):
+            raise IOError("rule path %s does not exist or cannot be accessed" % rule_path)
+
+        rule_paths = []
+        if os.path.isfile(rule_path):
+            rule_paths.append(rule_path)
+        elif os.path.isdir(rule_path):
+            for root, dirs, files in os.walk(rule_path):
+                if ".github" in root:
+                    # the .github directory contains CI config in capa-rules
+                    # this includes some .yml files
+                    # these are not rules
+                    continue
+                for file in files:
+                    if not file.endswith(".yml"):
+                        if not (file.endswith(".md") or file.endswith(".git") or file.endswith(".txt")):
+                            # expect to see readme.md, format.md, and maybe a .git directory
+                            # other things maybe are rules, but are mis-named.
+                            logger.warning("skipping non-.yml file: %s", file)
+                        continue
+                    rule_path = os.path.join(root, file)
+                    rule_paths.append(rule_path)
+
+        rules = []
+        total_paths = len(rule_paths)
+        for (i, rule_path) in enumerate(rule_paths):
+            self.progress.emit("loading capa rules from %s (%d of %d)" % (self.rule_path, i + 1, total_paths))
+            if self.cancelled:
+                raise UserCancelledError("user cancelled")
+            try:
+                rule = capa.rules.Rule.from_yaml_file(rule_path)
+            except capa.rules.InvalidRule:
+                raise
+            else:
+                rule.meta["capa/path"] = rule_path
+                if capa.main.is_nursery_rule_path(rule_path):
+                    rule.meta["capa/nursery"] = True
+                rules.append(rule)
+
+        # count before building RuleSet, which consumes the list
+        rule_count = len(rules)
+        return capa.rules.RuleSet(rules), rule_count
+
+
 class CapaExplorerForm(idaapi.PluginForm):
     """form element for plugin interface"""
 
@@ -86,9 +198,15 @@ class CapaExplorerForm(idaapi.PluginForm):
         self.parent = None
         self.ida_hooks = None
         self.doc = None
+        # capability rules from doc in display order, computed once per analysis and shared by renderers
+        self.doc_capability_rules = []
+
+        # address range of current function filter, (-1, -1) when not in a function
+        self.limit_results_range = (-1, -1)
 
         # models
         self.model_data = None
+        self.model_attack = None
         self.range_model_proxy = None
         self.search_model_proxy = None
 
@@ -96,6 +214,7 @@ class CapaExplorerForm(idaapi.PluginForm):
         self.view_limit_results_by_function = None
         self.view_search_bar = None
         self.view_tree = None
+        self.view_tree_reset_timer = None
         self.view_attack = None
         self.view_tabs = None
         self.view_menu_bar = None
@@ -134,12 +253,14 @@ class CapaExplorerForm(idaapi.PluginForm):
         ensure any plugin modifications (e.g. hooks and UI changes) are reset before the plugin is closed
         """
         self.unload_ida_hooks()
+        self.view_tree_reset_timer.stop()
         self.model_data.reset()
 
     def load_interface(self):
         """load user interface"""
         # load models
         self.model_data = CapaExplorerDataModel()
+        self.model_attack = CapaExplorerAttackModel()
 
         # model <- filter range <- filter search <- view
 
@@ -150,6 +271,7 @@ class CapaExplorerForm(idaapi.PluginForm):
         self.search_model_proxy.setSourceModel(self.range_model_proxy)
 
         self.view_tree = CapaExplorerQtreeView(self.search_model_proxy, self.parent)
+        self.load_view_tree_reset_timer()
         self.load_view_attack()
 
         # load parent tab and children tab views
@@ -183,26 +305,35 @@ class CapaExplorerForm(idaapi.PluginForm):
 
     def load_view_attack(self):
         """load MITRE ATT&CK table"""
-        table_headers = [
-            "ATT&CK Tactic",
-            "ATT&CK Technique ",
-        ]
+        table = QtWidgets.QTableView()
+        table.setModel(self.model_attack)
 
-        table = QtWidgets.QTableWidget()
-
-        table.setColumnCount(len(table_headers))
         table.verticalHeader().setVisible(False)
+        # fixed row heights, avoid per-row size hint calculations
+        table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
         table.setSortingEnabled(False)
         table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         table.setFocusPolicy(QtCore.Qt.NoFocus)
         table.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
-        table.setHorizontalHeaderLabels(table_headers)
         table.horizontalHeader().setDefaultAlignment(QtCore.Qt.AlignLeft)
+        # use fixed initial column widths instead of sizing columns to content on each render, which queries
+        # the size hint of every cell
+        table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Interactive)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.horizontalHeader().resizeSection(CapaExplorerAttackModel.COLUMN_INDEX_TACTIC, ATTACK_TACTIC_SECTION_SIZE)
         table.setShowGrid(False)
-        table.setStyleSheet("QTableWidget::item { padding: 25px; }")
+        table.setStyleSheet("QTableView::item { padding: 25px; }")
 
         self.view_attack = table
 
+    def load_view_tree_reset_timer(self):
+        """load timer used to coalesce tree view resets, e.g. when user navigates quickly between functions"""
+        timer = QtCore.QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(self.view_tree.reset_ui)
+
+        self.view_tree_reset_timer = timer
+
     def load_view_checkbox_limit_by(self):
         """load limit results by function checkbox"""
         check = QtWidgets.QCheckBox("Limit results to current function")
@@ -310,17 +441,34 @@ class CapaExplorerForm(idaapi.PluginForm):
         path = idaapi.ask_file(True, "*.json", "Choose file")
 
         # user cancelled, entered blank input, etc.
+        # note: save dialog confirms overwrite of existing files
         if not path:
             return
 
-        # check file exists, ask to override
-        if os.path.exists(path) and 1 != idaapi.ask_yn(1, "The selected file already exists. Overwrite?"):
-            return
-
-        with open(path, "wb") as export_file:
-            export_file.write(
-                json.dumps(self.doc, sort_keys=True, cls=capa.render.CapaJsonObjectEncoder).encode("utf-8")
-            )
+        try:
+            # prefer orjson, if installed, for faster serialization
+            import orjson
+        except ImportError:
+            orjson = None
+
+        # large buffer to reduce write calls, streamed output is written in many small chunks
+        with open(path, "wb", buffering=EXPORT_BUFFER_SIZE) as export_file:
+            if orjson:
+                # note: content matches the stdlib encoder, but output is compact (no spaces after separators) and
+                # non-str keys (e.g. match addresses) are sorted as strings, e.g. "10", "4198400", "9"
+                export_file.write(
+                    orjson.dumps(
+                        self.doc,
+                        default=orjson_default,
+                        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+                    )
+                )
+            else:
+                # stream encoded chunks to disk rather than building the entire JSON document in memory
+                for chunk in JSON_ENCODER.iterencode(self.doc):
+                    if isinstance(chunk, six.text_type):
+                        chunk = chunk.encode("utf-8")
+                    export_file.write(chunk)
 
     def load_ida_hooks(self):
         """load IDA UI hooks"""
@@ -350,6 +498,10 @@ class CapaExplorerForm(idaapi.PluginForm):
         @param meta: dict of key/value pairs set when action first called (may be empty)
         @param post: False if action first call, True if action second call
         """
+        if not self.doc:
+            # no results to update - ignore, avoids IDA API calls e.g. when renaming in scripted loops
+            return
+
         location = idaapi.get_screen_ea()
         if not location or not capa.ida.helpers.is_func_start(location):
             return
@@ -381,12 +533,18 @@ class CapaExplorerForm(idaapi.PluginForm):
             # ignore views not the assembly view
             return
 
-        if idaapi.get_func(new_ea) == idaapi.get_func(old_ea):
-            # user navigated same function - ignore
+        if self.limit_results_range[0] <= new_ea < self.limit_results_range[1]:
+            # user navigated same function - ignore, check cached range to avoid IDA function lookups
             return
 
-        self.limit_results_to_function(idaapi.get_func(new_ea))
-        self.view_tree.reset_ui()
+        f = idaapi.get_func(new_ea)
+        if not f and self.limit_results_range == (-1, -1):
+            # user navigated outside of a function and results are already limited to no function - ignore
+            return
+
+        self.limit_results_to_function(f)
+        # reset once user stops navigating, rather than on every function change
+        self.view_tree_reset_timer.start(VIEW_TREE_RESET_DELAY)
 
     def ida_hook_rebase(self, meta, post=False):
         """function hook for IDA "RebaseProgram" action
@@ -412,6 +570,7 @@ class CapaExplorerForm(idaapi.PluginForm):
         """
         # new analysis, new doc
         self.doc = None
+        self.doc_capability_rules = []
         self.process_total = 0
         self.process_count = 1
 
@@ -464,50 +623,8 @@ class CapaExplorerForm(idaapi.PluginForm):
             logger.info("User cancelled analysis.")
             return False
 
-        rule_path = self.rule_path
-
         try:
-            if not os.path.exists(rule_path):
-                raise IOError("rule path %s does not exist or cannot be accessed" % rule_path)
-
-            rule_paths = []
-            if os.path.isfile(rule_path):
-                rule_paths.append(rule_path)
-            elif os.path.isdir(rule_path):
-                for root, dirs, files in os.walk(rule_path):
-                    if ".github" in root:
-                        # the .github directory contains CI config in capa-rules
-                        # this includes some .yml files
-                        # these are not rules
-                        continue
-                    for file in files:
-                        if not file.endswith(".yml"):
-                            if not (file.endswith(".md") or file.endswith(".git") or file.endswith(".txt")):
-                                # expect to see readme.md, format.md, and maybe a .git directory
-                                # other things maybe are rules, but are mis-named.
-                                logger.warning("skipping non-.yml file: %s", file)
-                            continue
-                        rule_path = os.path.join(root, file)
-                        rule_paths.append(rule_path)
-
-            rules = []
-            total_paths = len(rule_paths)
-            for (i, rule_path) in enumerate(rule_paths):
-                update_wait_box("loading capa rules from %s (%d of %d)" % (self.rule_path, i + 1, total_paths))
-                if ida_kernwin.user_cancelled():
-                    raise UserCancelledError("user cancelled")
-                try:
-                    rule = capa.rules.Rule.from_yaml_file(rule_path)
-                except capa.rules.InvalidRule:
-                    raise
-                else:
-                    rule.meta["capa/path"] = rule_path
-                    if capa.main.is_nursery_rule_path(rule_path):
-                        rule.meta["capa/nursery"] = True
-                    rules.append(rule)
-
-            rule_count = len(rules)
-            rules = capa.rules.RuleSet(rules)
+            rules, rule_count = self.load_rules_in_background(update_wait_box)
         except UserCancelledError:
             logger.info("User cancelled analysis.")
             return False
@@ -575,7 +692,8 @@ class CapaExplorerForm(idaapi.PluginForm):
 
         try:
             self.doc = capa.render.convert_capabilities_to_result_document(meta, rules, capabilities)
-            self.model_data.render_capa_doc(self.doc)
+            self.doc_capability_rules = list(rutils.capability_rules(self.doc))
+            self.model_data.render_capa_doc(self.doc, self.doc_capability_rules)
             self.render_capa_doc_mitre_summary()
             self.enable_controls()
             self.set_view_status_label("capa rules directory: %s (%d rules)" % (self.rule_path, rule_count))
@@ -585,72 +703,112 @@ class CapaExplorerForm(idaapi.PluginForm):
 
         return True
 
+    def load_rules_in_background(self, update_wait_box):
+        """load capa rules on a background thread
+
+        run a local event loop until loading completes so the IDA wait box stays responsive, polling for user
+        cancellation
+
+        @param update_wait_box: function called with progress text
+
+        @retval tuple of (capa.rules.RuleSet, rule count)
+        """
+        thread = QtCore.QThread()
+        loader = CapaExplorerRulesLoader(self.rule_path)
+        loader.moveToThread(thread)
+
+        loop = QtCore.QEventLoop()
+
+        def slot_check_user_cancelled():
+            """slot function to forward user cancellation to loader"""
+            if ida_kernwin.user_cancelled():
+                loader.cancelled = True
+
+        timer = QtCore.QTimer()
+        timer.timeout.connect(slot_check_user_cancelled)
+
+        loader.progress.connect(update_wait_box)
+        loader.finished.connect(loop.quit)
+        thread.started.connect(loader.run)
+
+        thread.start()
+        timer.start(100)
+        try:
+            loop.exec_()
+        finally:
+            timer.stop()
+            thread.quit()
+            thread.wait()
+
+        if loader.error:
+            raise loader.error
+
+        return loader.rules, loader.rule_count
+
     def render_capa_doc_mitre_summary(self):
         """render MITRE ATT&CK results"""
-        tactics = collections.defaultdict(set)
+        # unique (tactic, spec) pairs, sorted once below to order by tactic and then technique
+        specs = set()
 
-        for rule in rutils.capability_rules(self.doc):
+        for rule in self.doc_capability_rules:
             if not rule["meta"].get("att&ck"):
                 continue
 
             for attack in rule["meta"]["att&ck"]:
-                tactic, _, rest = attack.partition("::")
-                if "::" in rest:
-                    technique, _, rest = rest.partition("::")
+                # e.g. "Tactic::Technique::Subtechnique T1234.001" or "Tactic::Technique T1234"
+                parts = attack.split("::", 2)
+                if len(parts) == 3:
+                    tactic, technique, rest = parts
                     subtechnique, _, id = rest.rpartition(" ")
-                    tactics[tactic].add((technique, subtechnique, id))
-                else:
+                    specs.add((tactic, (technique, subtechnique, id)))
+                elif len(parts) == 2:
+                    tactic, rest = parts
                     technique, _, id = rest.rpartition(" ")
-                    tactics[tactic].add((technique, id))
-
-        column_one = []
-        column_two = []
-
-        for (tactic, techniques) in sorted(tactics.items()):
-            column_one.append(tactic.upper())
-            # add extra space when more than one technique
-            column_one.extend(["" for i in range(len(techniques) - 1)])
-
-            for spec in sorted(techniques):
-                if len(spec) == 2:
-                    technique, id = spec
-                    column_two.append("%s %s" % (technique, id))
-                elif len(spec) == 3:
-                    technique, subtechnique, id = spec
-                    column_two.append("%s::%s %s" % (technique, subtechnique, id))
+                    specs.add((tactic, (technique, id)))
                 else:
-                    raise RuntimeError("unexpected ATT&CK spec format")
-
-        self.view_attack.setRowCount(max(len(column_one), len(column_two)))
-
-        for (row, value) in enumerate(column_one):
-            self.view_attack.setItem(row, 0, self.render_new_table_header_item(value))
-
-        for (row, value) in enumerate(column_two):
-            self.view_attack.setItem(row, 1, QtWidgets.QTableWidgetItem(value))
-
-        # resize columns to content
-        self.view_attack.resizeColumnsToContents()
-
-    def render_new_table_header_item(self, text):
-        """create new table header item with our style
-
-        @param text: header text to display
-        """
-        item = QtWidgets.QTableWidgetItem(text)
-        item.setForeground(QtGui.QColor(37, 147, 215))
-        font = QtGui.QFont()
-        font.setBold(True)
-        item.setFont(font)
-        return item
+                    # no "::" separator, e.g. badly formatted rule metadata - display entire entry as tactic
+                    specs.add((attack, ("", "")))
+
+        rows = []
+        prev_tactic = None
+
+        for (tactic, spec) in sorted(specs):
+            if len(spec) == 2:
+                technique, id = spec
+                display = "%s %s" % (technique, id)
+            elif len(spec) == 3:
+                technique, subtechnique, id = spec
+                display = "%s::%s %s" % (technique, subtechnique, id)
+            else:
+                raise RuntimeError("unexpected ATT&CK spec format")
+
+            # display tactic on first row only, leave extra space when more than one technique
+            rows.append((tactic.upper() if tactic != prev_tactic else "", display))
+            prev_tactic = tactic
+
+        # disable redraw while populating table
+        with updates_disabled(self.view_attack):
+            self.model_attack.render_rows(rows)
 
     def reset_view_tree(self):
         """reset tree view UI controls
 
         called when user selects plugin reset from menu
         """
-        self.view_limit_results_by_function.setChecked(False)
-        self.view_search_bar.setText("")
+        # reset controls with signals blocked, otherwise each control's slot resets the tree view; reset filters
+        # directly and reset the tree view once
+        if self.view_limit_results_by_function.isChecked():
+            self.view_limit_results_by_function.blockSignals(True)
+            self.view_limit_results_by_function.setChecked(False)
+            self.view_limit_results_by_function.blockSignals(False)
+            self.range_model_proxy.reset_address_range_filter()
+
+        if self.view_search_bar.text():
+            self.view_search_bar.blockSignals(True)
+            self.view_search_bar.setText("")
+            self.view_search_bar.blockSignals(False)
+            self.search_model_proxy.reset_query()
+
         self.view_tree.reset_ui()
 
     def slot_analyze(self):
@@ -662,13 +820,19 @@ class CapaExplorerForm(idaapi.PluginForm):
         self.search_model_proxy.invalidate()
         self.model_data.reset()
         self.model_data.clear()
+        self.model_attack.clear()
         self.disable_controls()
         self.set_view_status_label("Loading...")
 
+        # prevent analysis from being started again while rules load in the background
+        self.view_analyze_button.setEnabled(False)
+
         ida_kernwin.show_wait_box("capa explorer")
         success = self.load_capa_results()
         ida_kernwin.hide_wait_box()
 
+        self.view_analyze_button.setEnabled(True)
+
         self.reset_view_tree()
 
         if not success:
@@ -709,10 +873,12 @@ class CapaExplorerForm(idaapi.PluginForm):
         @param f: (IDA func_t)
         """
         if f:
-            self.range_model_proxy.add_address_range_filter(f.start_ea, f.end_ea)
+            self.limit_results_range = (f.start_ea, f.end_ea)
         else:
             # if function not exists don't display any results (assume address never -1)
-            self.range_model_proxy.add_address_range_filter(-1, -1)
+            self.limit_results_range = (-1, -1)
+
+        self.range_model_proxy.add_address_range_filter(*self.limit_results_range)
 
     def slot_limit_results_to_search(self, text):
         """limit tree view results to search matches
@@ -424,15 +424,19 @@ class CapaExplorerDataModel(QtCore.QAbstractItemModel):
         for child in match.get("children", []):
             self.render_capa_doc_match(parent2, child, doc)
 
-    def render_capa_doc(self, doc):
+    def render_capa_doc(self, doc, rules=None):
         """render capa features specified in doc
 
         @param doc: capa result doc
+        @param rules: capability rules from doc, as returned by rutils.capability_rules; computed if not provided
         """
+        if rules is None:
+            rules = rutils.capability_rules(doc)
+
         # inform model that changes are about to occur
         self.beginResetModel()
 
-        for rule in rutils.capability_rules(doc):
+        for rule in rules:
             rule_name = rule["meta"]["name"]
             rule_namespace = rule["meta"].get("namespace")
             parent = CapaExplorerRuleItem(
@@ -579,3 +583,108 @@ class CapaExplorerDataModel(QtCore.QAbstractItemModel):
             # replace old function name with new function name and emit change
             model_index.internalPointer().info = new_name
             self.dataChanged.emit(model_index, model_index)
+
+
+class CapaExplorerAttackModel(QtCore.QAbstractTableModel):
+    """model for displaying MITRE ATT&CK results returned by capa
+
+    rows are stored as (tactic, technique) display string tuples; Qt queries data for visible cells only
+    """
+
+    COLUMN_INDEX_TACTIC = 0
+    COLUMN_INDEX_TECHNIQUE = 1
+
+    COLUMN_COUNT = 2
+
+    def __init__(self, parent=None):
+        """initialize model"""
+        super(CapaExplorerAttackModel, self).__init__(parent)
+        self.headers = ("ATT&CK Tactic", "ATT&CK Technique ")
+        self.rows = []
+
+        # tactic style, created once and shared by all cells instead of per call to data
+        self.tactic_font = QtGui.QFont()
+        self.tactic_font.setBold(True)
+        self.tactic_brush = QtGui.QBrush(QtGui.QColor(37, 147, 215))
+
+    def clear(self):
+        """clear model data
+
+        called when view wants to clear UI display
+        """
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    def render_rows(self, rows):
+        """replace model data with new rows
+
+        @param rows: list of (tactic, technique) display string tuples
+        """
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, model_index=QtCore.QModelIndex()):
+        """return number of rows
+
+        @param model_index: QModelIndex
+
+        @retval row count
+        """
+        if model_index.isValid():
+            # table model, no children
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, model_index=QtCore.QModelIndex()):
+        """return number of columns
+
+        @param model_index: QModelIndex
+
+        @retval column count
+        """
+        if model_index.isValid():
+            # table model, no children
+            return 0
+        return CapaExplorerAttackModel.COLUMN_COUNT
+
+    def data(self, model_index, role):
+        """return data stored at given index by display role
+
+        @param model_index: QModelIndex
+        @param role: QtCore.Qt.*
+
+        @retval data to be displayed
+        """
+        if not model_index.isValid():
+            return None
+
+        column = model_index.column()
+
+        if role == QtCore.Qt.DisplayRole:
+            return self.rows[model_index.row()][column]
+
+        if role == QtCore.Qt.FontRole and column == CapaExplorerAttackModel.COLUMN_INDEX_TACTIC:
+            # set bold font for tactics
+            return self.tactic_font
+
+        if role == QtCore.Qt.ForegroundRole and column == CapaExplorerAttackModel.COLUMN_INDEX_TACTIC:
+            # set color for tactics
+            return self.tactic_brush
+
+        return None
+
+    def headerData(self, section, orientation, role):
+        """return data for the given role and section in the header with the specified orientation
+
+        @param section: int
+        @param orientation: QtCore.Qt.Orientation
+        @param role: QtCore.Qt.DisplayRole
+
+        @retval header data
+        """
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.headers[section]
+
+        return None
@@ -6,6 +6,8 @@
 #  is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and limitations under the License.
 
+import contextlib
+
 import idc
 from PyQt5 import QtCore, QtWidgets
 
@@ -15,6 +17,22 @@ from capa.ida.plugin.model import CapaExplorerDataModel
 MAX_SECTION_SIZE = 750
 
 
+@contextlib.contextmanager
+def updates_disabled(widget):
+    """disable widget redraw during bulk updates, repaint once when complete
+
+    model signals are not blocked; views depend on them (e.g. model reset) to stay in sync with their model
+
+    @param widget: QAbstractItemView, or other QAbstractScrollArea, e.g. QTreeView or QTableView
+    """
+    widget.setUpdatesEnabled(False)
+    try:
+        yield widget
+    finally:
+        widget.setUpdatesEnabled(True)
+        widget.viewport().update()
+
+
 class CapaExplorerQtreeView(QtWidgets.QTreeView):
     """tree view used to display hierarchical capa results
 
@@ -42,6 +60,9 @@ class CapaExplorerQtreeView(QtWidgets.QTreeView):
         self.setSortingEnabled(True)
         self.model.setDynamicSortFilter(False)
 
+        # all rows share the same height, avoid per-row size hint calculations during layout and paint
+        self.setUniformRowHeights(True)
+
         # configure view columns to auto-resize
         for idx in range(CapaExplorerDataModel.COLUMN_COUNT):
             self.header().setSectionResizeMode(idx, QtWidgets.QHeaderView.Interactive)
@@ -66,14 +87,17 @@ class CapaExplorerQtreeView(QtWidgets.QTreeView):
 
         @param should_sort: True, sort results after reset, False don't sort results after reset
         """
-        if should_sort:
-            self.sortByColumn(CapaExplorerDataModel.COLUMN_INDEX_RULE_INFORMATION, QtCore.Qt.AscendingOrder)
+        # disable redraw until sort, expansion, and column resize complete
+        with updates_disabled(self):
+            if should_sort:
+                self.sortByColumn(CapaExplorerDataModel.COLUMN_INDEX_RULE_INFORMATION, QtCore.Qt.AscendingOrder)
 
-        self.should_resize_columns = False
-        self.expandToDepth(0)
-        self.should_resize_columns = True
+            # expand in a single pass, avoid per-item expand signals resizing columns
+            self.should_resize_columns = False
+            self.expandToDepth(0)
+            self.should_resize_columns = True
 
-        self.slot_resize_columns_to_content()
+            self.slot_resize_columns_to_content()
 
     def slot_resize_columns_to_content(self):
         """reset view columns to contents"""